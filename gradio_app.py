@@ -11,13 +11,38 @@ Features:
 - Download converted files
 """
 
+import asyncio
+import collections
+import functools
+import hashlib
+import itertools
+import json
 import os
+import site
 import subprocess
 import sys
+import threading
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
 
+try:  # optional: zlib-ng deflates the same stream roughly twice as fast as stdlib zlib
+    from zlib_ng import zlib_ng
+except ImportError:
+    pass
+else:
+    # zipfile looks up zlib.compressobj on every entry, so deflating goes through zlib-ng.
+    # Its crc32 was bound from stdlib zlib at import and is unaffected by this.
+    zipfile.zlib = zlib_ng
+
+try:  # optional: BLAKE3 hashes uploads several times faster than hashlib
+    from blake3 import blake3 as _pdf_hasher
+except ImportError:
+    _pdf_hasher = hashlib.blake2b
+
 import gradio as gr
 
 print(f"Gradio version: {gr.__version__}")
@@ -26,58 +51,433 @@ print(f"Gradio version: {gr.__version__}")
 REPO_ROOT = Path(__file__).resolve().parent
 DEFAULT_OUTPUT_DIR = str(REPO_ROOT / "out")
 CONVERTER_SCRIPT = str(REPO_ROOT / "scripts" / "pdf_to_semantic_html.py")
+# Cached results are only reused by the converter that produced them
+CONVERTER_VERSION = hashlib.blake2b(Path(CONVERTER_SCRIPT).read_bytes(), digest_size=8).hexdigest()
 
 # Set up environment with user's site-packages
 ENV = os.environ.copy()
-USER_SITE = os.path.expanduser('~/.local/lib/python3.12/site-packages')
+USER_SITE = site.getusersitepackages()
 if 'PYTHONPATH' in ENV:
-    ENV['PYTHONPATH'] = USER_SITE + ':' + ENV['PYTHONPATH']
+    ENV['PYTHONPATH'] = USER_SITE + os.pathsep + ENV['PYTHONPATH']
 else:
     ENV['PYTHONPATH'] = USER_SITE
 
-def convert_pdf(pdf_path, output_dir, no_images=False, no_toc=False, keep_toc_pages=False):
-    """Run pdf_to_semantic_html.py with custom options."""
-    output_dir = os.path.abspath(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
-
-    cmd = [sys.executable, CONVERTER_SCRIPT, pdf_path, "--out", output_dir]
-
+sys.path.insert(0, os.path.dirname(CONVERTER_SCRIPT))
+import pdf_to_semantic_html as converter  # noqa: E402
+
+# Set PDF_TO_HTML_SUBPROCESS=1 to run every conversion in a fresh interpreter
+USE_SUBPROCESS = os.environ.get("PDF_TO_HTML_SUBPROCESS", "") not in ("", "0")
+
+# converter.run() redirects the process-wide sys.stdout, so in-process runs are serialized
+_CONVERTER_LOCK = threading.Lock()
+
+# Fixed part of the converter command line for subprocess mode
+_CMD_PREFIX = (sys.executable, "-u", CONVERTER_SCRIPT)
+
+# Long-lived converter process used for single conversions in subprocess mode
+_worker = None
+_WORKER_LOCK = threading.Lock()
+# Seconds the worker may go without printing before it is considered hung and killed
+WORKER_IDLE_TIMEOUT = 300
+
+# Batch conversions fan out over worker processes, capped to keep open files in check
+MAX_BATCH_WORKERS = min(os.cpu_count() or 1, 8)
+_batch_pool = None
+
+# Page extraction workers beyond the CPU count only add process start-up cost
+MAX_PAGE_WORKERS = os.cpu_count() or 1
+
+# Finished conversions keyed by PDF content and options; re-converting an unchanged
+# upload reuses the earlier HTML. Entries are mirrored to <out>/.cache/ to survive restarts.
+RESULT_CACHE_SIZE = 64
+RESULT_CACHE_DIR = ".cache"
+_result_cache = collections.OrderedDict()
+# Lookups and stores run on worker threads (they touch the disk), so the LRU is locked
+_RESULT_CACHE_LOCK = threading.Lock()
+
+# Level 4 deflates HTML noticeably faster than the default 6 for a ~3% larger entry;
+# image files that are not stored (below) are deflated at the same level
+HTML_COMPRESS_LEVEL = 4
+
+# Extracted images are already compressed; deflating them again costs CPU for no gain.
+STORED_IMAGE_SUFFIXES = frozenset({".png", ".jpg", ".jpeg", ".jpx", ".webp", ".gif"})
+
+# Image reads kept in flight while a download ZIP is written: one thread per CPU up to 4
+# (file reads release the GIL), plus one so the next image is already loading while the
+# writer is busy with the current one. This is also how many images sit in memory at once.
+ZIP_READ_WORKERS = min(os.cpu_count() or 1, 4) + 1
+
+# Only the end of the converter log is kept for the status box
+LOG_TAIL_CHARS = 8192
+
+# Status box messages
+CONVERT_PROGRESS_TMPL = "⏳ Converting `{pdf}`...\n\n📝 Log:\n{log}"
+CONVERT_FAILED_TMPL = (
+    "❌ Conversion failed!\n"
+    "📄 Input: `{pdf}`\n"
+    "📁 Output dir: `{out}`\n"
+    "🔴 Exit code: {code}\n"
+    "📝 Log:\n{log}"
+)
+CONVERT_OK_ZIP_TMPL = (
+    "✅ Conversion complete!\n\n"
+    "📄 Input: `{pdf}`\n"
+    "📁 Output: `{html}`\n"
+    "📦 Download: `{zip}` (HTML + images)\n"
+    "📊 Size: {html_kb:.1f} KB (HTML), {zip_kb:.1f} KB (ZIP)\n\n"
+    "📝 Log:\n{log}\n\n"
+    "📥 File ready for download below! (ZIP contains HTML + images folder)"
+)
+CONVERT_OK_TMPL = (
+    "✅ Conversion complete!\n\n"
+    "📄 Input: `{pdf}`\n"
+    "📁 Output: `{html}`\n"
+    "📊 Size: {html_kb:.1f} KB\n\n"
+    "📝 Log:\n{log}\n\n"
+    "📥 File ready for download below!"
+)
+CONVERT_CACHED_LOG = "♻️ Reusing the earlier conversion of this PDF (same content and options)\n"
+CONVERT_NOT_FOUND_TMPL = (
+    "❌ Output file not found!\n\n"
+    "📄 Input: `{pdf}`\n"
+    "📁 Output directory: `{out}`\n\n"
+    "📝 Log:\n{log}"
+)
+BATCH_PROGRESS_TMPL = "⏳ Converting PDFs in `{folder}`...\n\n📝 Log:\n{log}"
+BATCH_FAILED_TMPL = (
+    "❌ Batch conversion failed!\n\n"
+    "📁 Input folder: `{folder}`\n"
+    "📁 Output dir: `{out}`\n"
+    "🔴 Exit code: {code}\n"
+    "📝 Log:\n{log}"
+)
+BATCH_OK_TMPL = (
+    "✅ Batch conversion complete!\n\n"
+    "📁 Folder: {folder}\n"
+    "📁 Output: {out}\n"
+    "📊 Generated: {count} HTML files\n\n"
+    "📝 Log:\n{log}\n\n"
+    "📥 Browse output directory for individual files"
+)
+BATCH_EMPTY_TMPL = (
+    "❌ No HTML files found in output directory!\n\n"
+    "📁 Input folder: {folder}\n"
+    "📁 Output directory: `{out}`\n"
+    "📝 Log:\n{log}"
+)
+
+@functools.lru_cache(maxsize=32)
+def _abs(path):
+    """Cached os.path.abspath; the server never changes its working directory."""
+    return os.path.abspath(path)
+
+@functools.lru_cache(maxsize=8)
+def _flags(no_images, no_toc, keep_toc_pages, batch, workers, progress, jobs):
+    """Converter option flags for one combination of UI settings."""
+    flags = []
+
+    if batch:
+        flags.extend(["--batch", "--recursive"])
     if no_images:
-        cmd.append("--no-images")
+        flags.append("--no-images")
     if no_toc:
-        cmd.append("--no-toc")
+        flags.append("--no-toc")
     if keep_toc_pages:
-        cmd.append("--keep-toc-pages")
+        flags.append("--keep-toc-pages")
+    if workers > 1:
+        flags.extend(["--workers", str(workers)])
+    if jobs > 1:
+        flags.extend(["--jobs", str(jobs)])
+    if progress:
+        flags.append("--progress")
+
+    return tuple(flags)
+
+def build_args(input_path, output_dir, no_images=False, no_toc=False, keep_toc_pages=False, batch=False, workers=1,
+               progress=False, jobs=1):
+    """Build the converter command-line arguments."""
+    return [
+        input_path, "--out", output_dir, "--report-outputs",
+        *_flags(bool(no_images), bool(no_toc), bool(keep_toc_pages), batch, workers, progress, jobs)
+    ]
 
+class _QueueWriter(converter.LineWriter):
+    """Text stream that hands complete lines from a worker thread to an asyncio queue."""
+
+    def __init__(self, loop, queue):
+        super().__init__()
+        self._loop = loop
+        self._queue = queue
+
+    def _send(self, text):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+def _run_in_process(args, stream):
+    """Run the converter in this process, one conversion at a time, and return its exit code."""
+    with _CONVERTER_LOCK:
+        _, returncode = converter.run(args, stream)
+    stream.flush()
+    return returncode
+
+def _run_in_worker(args, stream):
+    """Send one conversion to the persistent converter process, starting it if needed.
+
+    Output is written to stream as the worker reports it; returns the exit code.
+    """
+    global _worker
+    with _WORKER_LOCK:
+        if _worker is None or _worker.poll() is not None:
+            _worker = subprocess.Popen(
+                [*_CMD_PREFIX, "--server"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                env=ENV,
+                close_fds=False,
+                restore_signals=False
+            )
+        worker = _worker
+        timed_out = threading.Event()
+        finished = threading.Event()
+        deadline = time.monotonic() + WORKER_IDLE_TIMEOUT
+
+        def watch():
+            # One watchdog per request; every reply line pushes the deadline back
+            while not finished.wait(deadline - time.monotonic()):
+                if time.monotonic() >= deadline:
+                    timed_out.set()
+                    worker.kill()
+                    return
+
+        threading.Thread(target=watch, daemon=True).start()
+        try:
+            worker.stdin.write(json.dumps({"args": args}) + "\n")
+            worker.stdin.flush()
+            while True:
+                reply = worker.stdout.readline()
+                deadline = time.monotonic() + WORKER_IDLE_TIMEOUT
+                message = json.loads(reply)  # EOF ("") fails here too
+                stream.write(message["output"])
+                if "returncode" in message:
+                    stream.flush()
+                    return message["returncode"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            finished.set()
+        # The worker died, hung or sent something unreadable; the next call starts a fresh one
+        worker.kill()
+        worker.wait()
+        _worker = None
+        stream.write(
+            f"Converter process timed out after {WORKER_IDLE_TIMEOUT}s without output.\n"
+            if timed_out.is_set()
+            else "Converter process exited unexpectedly.\n"
+        )
+        stream.flush()
+        return 1
+
+def _convert_shard(pdf_paths, output_dir, no_images, no_toc, keep_toc_pages):
+    """Convert a shard of PDFs inside a worker process and return (output, processed, failures)."""
+    outputs = []
+    failures = 0
+    for pdf_path in pdf_paths:
+        output, returncode = converter.run(
+            build_args(pdf_path, output_dir, no_images, no_toc, keep_toc_pages, batch=True)
+        )
+        outputs.append(output)
+        if returncode != 0:
+            failures += 1
+    return "".join(outputs), len(pdf_paths), failures
+
+def _get_batch_pool():
+    """Return the process pool shared by all batch conversions, creating it on first use."""
+    global _batch_pool
+    if _batch_pool is None:
+        # Workers stay alive (PyMuPDF imported) between batches
+        _batch_pool = ProcessPoolExecutor(max_workers=MAX_BATCH_WORKERS, mp_context=converter.pool_context())
+    return _batch_pool
+
+async def _stream_from_thread(run, args):
+    """Call run(args, stream) on a thread, yielding (line, None) as it writes, then ("", returncode)."""
+    # Output lines arrive via the queue and None marks the end, queued after every line
+    # the thread wrote
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    future = loop.run_in_executor(None, run, args, _QueueWriter(loop, queue))
+    future.add_done_callback(lambda _: queue.put_nowait(None))
+    while (line := await queue.get()) is not None:
+        yield line, None
+    yield "", await future
+
+async def run_converter(args):
+    """Run the converter with CLI arguments.
+
+    Yields (output, None) for each chunk of combined stdout/stderr as it is
+    produced, then ("", returncode) once the run has finished.
+    """
+    if not USE_SUBPROCESS:
+        # Run in a thread to keep the event loop free
+        async for chunk in _stream_from_thread(_run_in_process, args):
+            yield chunk
+        return
+
+    # Python creates fds non-inheritable, so close_fds=False safely skips the fd-close
+    # sweep; together with no preexec_fn this lets CPython use posix_spawn. The child is
+    # Python, which sets its own signal dispositions, so restoring them is wasted work.
+    proc = await asyncio.create_subprocess_exec(
+        *_CMD_PREFIX, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=ENV,
+        close_fds=False,
+        restore_signals=False
+    )
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=ENV)
-        return result.stdout, result.stderr, 0
-    except subprocess.CalledProcessError as e:
-        return e.stdout, e.stderr, e.returncode
-
-def convert_folder(folder_path, output_dir, no_images, no_toc, keep_toc_pages):
-    """Convert all PDFs in a folder."""
-    output_dir = os.path.abspath(output_dir)
-
-    cmd = [
-        sys.executable, CONVERTER_SCRIPT, folder_path,
-        "--out", output_dir,
-        "--batch",
-        "--recursive"
+        async for line in proc.stdout:
+            yield line.decode("utf-8", "replace"), None
+        yield "", await proc.wait()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+async def convert_pdf(pdf_path, output_dir, no_images=False, no_toc=False, keep_toc_pages=False, workers=1):
+    """Convert a single PDF with custom options, streaming converter output."""
+    output_dir = _abs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    args = build_args(pdf_path, output_dir, no_images, no_toc, keep_toc_pages, workers=workers, progress=True)
+
+    # In subprocess mode, reuse one worker process so PyMuPDF is imported once, not on every click
+    chunks = _stream_from_thread(_run_in_worker, args) if USE_SUBPROCESS else run_converter(args)
+    async for chunk in chunks:
+        yield chunk
+
+async def convert_folder(folder_path, output_dir, no_images, no_toc, keep_toc_pages):
+    """Convert all PDFs in a folder, streaming converter output."""
+    global _batch_pool
+    output_dir = _abs(output_dir)
+
+    if USE_SUBPROCESS:
+        async for chunk in run_converter(
+            build_args(folder_path, output_dir, no_images, no_toc, keep_toc_pages, batch=True, jobs=MAX_BATCH_WORKERS)
+        ):
+            yield chunk
+        return
+
+    pdf_paths = [str(path) for path in converter.collect_pdf_paths(Path(folder_path).expanduser().resolve(), True)]
+    if not pdf_paths:
+        yield "No PDF files found to process.\n", None
+        yield "", 1
+        return
+    yield f"Found {len(pdf_paths)} PDF files\n", None
+
+    # Hash every PDF first (hashlib releases the GIL, so threads overlap) and skip the
+    # ones whose output from an earlier batch with the same options is still in place
+    digests = await asyncio.to_thread(_digest_all, pdf_paths)
+    out_root = Path(output_dir).resolve()
+    # PDFs sharing a stem (a.pdf, x/a.pdf) write the same <out>/<stem>/index.html. They
+    # are never cached and go through one shard in order, so the last one wins every time.
+    stem_counts = collections.Counter(Path(pdf_path).stem for pdf_path in pdf_paths)
+    candidates = []
+    for pdf_path, digest in zip(pdf_paths, digests):
+        # Identical PDFs in different places write different outputs, so each gets its own entry
+        output_html = out_root / Path(pdf_path).stem / "index.html"
+        images_dir = None if no_images else output_html.parent / "images"
+        key = None
+        if stem_counts[Path(pdf_path).stem] == 1:
+            key = result_key(
+                digest, no_images, no_toc, keep_toc_pages, batch=True, target=f"{Path(pdf_path).name}\0{output_html}"
+            )
+        candidates.append((pdf_path, key, output_html, images_dir))
+    unchanged = await asyncio.to_thread(_unchanged_outputs, output_dir, candidates)
+    pending = []
+    skipped = []
+    for candidate, is_unchanged in zip(candidates, unchanged):
+        pdf_path, _, output_html, _ = candidate
+        if is_unchanged:
+            skipped.append(
+                f"Unchanged since last run, skipped: {pdf_path} -> {output_html}\n"
+                f"{converter.OUTPUT_MARKER}{output_html}\n"
+            )
+        else:
+            pending.append(candidate)
+    if skipped:
+        yield "".join(skipped), None
+    if not pending:
+        yield "", 0
+        return
+    pdf_paths = [pdf_path for pdf_path, _, _, _ in pending]
+    reported = set()
+
+    if len(pdf_paths) == 1:
+        # Not worth a round trip through the pool
+        async for chunk, returncode in run_converter(
+            build_args(pdf_paths[0], output_dir, no_images, no_toc, keep_toc_pages, batch=True)
+        ):
+            reported.update(split_output_markers(chunk)[1])
+            if returncode is not None:
+                await asyncio.to_thread(_remember_batch_outputs, output_dir, pending, reported)
+            yield chunk, returncode
+        return
+
+    # A few chunks per worker balances uneven PDFs without paying per-file dispatch
+    own_stem = [pdf_path for pdf_path, key, _, _ in pending if key is not None]
+    shared_stem = [pdf_path for pdf_path, key, _, _ in pending if key is None]
+    chunksize = max(1, len(own_stem) // (MAX_BATCH_WORKERS + 2))
+    chunks = [own_stem[i:i + chunksize] for i in range(0, len(own_stem), chunksize)]
+    if shared_stem:
+        chunks.append(shared_stem)
+    loop = asyncio.get_running_loop()
+    pool = _get_batch_pool()
+    futures = [
+        loop.run_in_executor(pool, _convert_shard, chunk, output_dir, no_images, no_toc, keep_toc_pages)
+        for chunk in chunks
     ]
-
-    if no_images:
-        cmd.append("--no-images")
-    if no_toc:
-        cmd.append("--no-toc")
-    if keep_toc_pages:
-        cmd.append("--keep-toc-pages")
-
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=ENV)
-        return result.stdout, result.stderr, 0
-    except subprocess.CalledProcessError as e:
-        return e.stdout, e.stderr, e.returncode
+        done = 0
+        failures = 0
+        for future in asyncio.as_completed(futures):
+            output, processed, chunk_failures = await future
+            reported.update(split_output_markers(output)[1])
+            done += processed
+            failures += chunk_failures
+            yield f"{output}[{done}/{len(pdf_paths)}] PDFs processed\n", None
+        await asyncio.to_thread(_remember_batch_outputs, output_dir, pending, reported)
+        yield "", 1 if failures else 0
+    except BrokenProcessPool:
+        # A worker died (e.g. crashed inside PyMuPDF); start a fresh pool next time, unless
+        # a concurrent batch that hit the same break has already replaced it
+        if _batch_pool is pool:
+            _batch_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        yield "A batch worker process exited unexpectedly.\n", None
+        yield "", 1
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _digest_all(pdf_paths):
+    """pdf_digest for each path, hashed on a few threads."""
+    with ThreadPoolExecutor(max_workers=MAX_BATCH_WORKERS + 1) as pool:
+        return list(pool.map(pdf_digest, pdf_paths))
+
+def _unchanged_outputs(output_dir, candidates):
+    """For each (pdf_path, key, output_html, images_dir), whether its cached output is still in place."""
+    return [
+        key is not None and lookup_cached_result(output_dir, key, output_html, images_dir) is not None
+        for _, key, output_html, images_dir in candidates
+    ]
+
+def _remember_batch_outputs(output_dir, pending, reported):
+    """Cache the outputs the converter reported writing; failed PDFs report none."""
+    for _, key, output_html, images_dir in pending:
+        if key is not None and output_html in reported:
+            try:
+                store_cached_result(output_dir, key, output_html, os.stat(output_html), images_dir)
+            except OSError:
+                pass
 
 def create_ui():
     """Create Gradio interface."""
@@ -99,7 +499,8 @@ Convert PDFs to clean, SEO-optimized HTML with headings, TOC, figures, and schem
                 pdf_input = gr.File(
                     label="📄 Upload PDF",
                     file_types=[".pdf"],
-                    file_count="single"
+                    file_count="single",
+                    type="filepath"
                 )
 
                 with gr.Column():
@@ -130,6 +531,17 @@ Convert PDFs to clean, SEO-optimized HTML with headings, TOC, figures, and schem
                         info="Include PDF TOC pages in output"
                     )
 
+                # gr.Slider needs maximum > minimum, so a single-CPU host just hides it
+                workers = gr.Slider(
+                    label="⚙️ Workers",
+                    minimum=1,
+                    maximum=max(2, MAX_PAGE_WORKERS),
+                    value=1,
+                    step=1,
+                    visible=MAX_PAGE_WORKERS > 1,
+                    info="Processes used to extract page text (helps on long PDFs)"
+                )
+
             with gr.Row():
                 convert_btn = gr.Button("🔄 Convert", variant="primary", size="lg")
 
@@ -175,7 +587,7 @@ Convert PDFs to clean, SEO-optimized HTML with headings, TOC, figures, and schem
         # Event handlers
         convert_btn.click(
             fn=handle_convert,
-            inputs=[pdf_input, output_dir, no_images, no_toc, keep_toc_pages],
+            inputs=[pdf_input, output_dir, no_images, no_toc, keep_toc_pages, workers],
             outputs=[status_output, download_file]
         )
 
@@ -192,140 +604,328 @@ Convert PDFs to clean, SEO-optimized HTML with headings, TOC, figures, and schem
 
     return demo
 
-def create_zip_with_images(html_file, output_dir_path):
-    """Create a ZIP file containing HTML and images folder if it exists."""
+def create_zip_with_images(html_file, output_dir_path, html_stat=None):
+    """Create a ZIP file containing HTML and images folder if it exists.
+
+    Returns (download path, ZIP size in bytes); the size is None when there are
+    no images and the HTML file itself is the download. An existing ZIP is reused
+    when the HTML and every image are unchanged since it was written.
+    """
     pdf_name = html_file.stem
     images_dir = html_file.parent / "images"
 
-    # Check if images directory exists and has content
-    if not images_dir.exists() or not list(images_dir.glob("*")):
-        return html_file  # No images to include
+    # One scandir pass both checks for images and lists them; DirEntry.is_file()
+    # uses the type from the directory listing instead of a stat per entry
+    try:
+        with os.scandir(images_dir) as it:
+            img_entries = [entry for entry in it if entry.is_file()]
+    except OSError:
+        img_entries = []
+    if not img_entries:
+        return html_file, None  # No images to include
 
     # Create ZIP file
     zip_path = html_file.parent / f"{pdf_name}_with_images.zip"
 
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    # Sizes and mtimes of everything that goes into the archive, recorded next to it
+    html_stat = html_stat or html_file.stat()
+    fingerprint = [[html_stat.st_size, html_stat.st_mtime_ns]]
+    for entry in img_entries:
+        st = entry.stat()
+        fingerprint.append([entry.name, st.st_size, st.st_mtime_ns])
+    fingerprint_path = zip_path.with_name(zip_path.name + ".fp")
+    try:
+        with open(fingerprint_path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous["fingerprint"] == fingerprint and os.stat(zip_path).st_size == previous["zip_size"]:
+            return zip_path, previous["zip_size"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with open(zip_path, "wb") as zip_fp, zipfile.ZipFile(
+        zip_fp, 'w', zipfile.ZIP_DEFLATED, compresslevel=HTML_COMPRESS_LEVEL
+    ) as zipf:
         # Add HTML file (put it in the root of ZIP)
         zipf.write(html_file, html_file.name)
 
-        # Add images folder with all images
-        for img_file in images_dir.glob("*"):
-            if img_file.is_file():
-                # Add with relative path: images/filename.ext
-                zipf.write(img_file, f"images/{img_file.name}")
+        # Add images folder with all images, read ahead on a small thread pool
+        # (file reads release the GIL) while entries are written in order here.
+        # Only ZIP_READ_WORKERS reads are in flight, so just a few images sit in memory.
+        with ThreadPoolExecutor(max_workers=ZIP_READ_WORKERS) as pool:
+            pending_entries = iter(img_entries)
+            reads = collections.deque(
+                (entry, pool.submit(Path(entry.path).read_bytes))
+                for entry in itertools.islice(pending_entries, ZIP_READ_WORKERS)
+            )
+            while reads:
+                entry, read = reads.popleft()
+                data = read.result()
+                next_entry = next(pending_entries, None)
+                if next_entry is not None:
+                    reads.append((next_entry, pool.submit(Path(next_entry.path).read_bytes)))
+                # Add with relative path: images/filename.ext. DirEntry caches the stat taken
+                # for the fingerprint, so this records what ZipInfo.from_file would without a new stat
+                st = entry.stat()
+                zinfo = zipfile.ZipInfo(f"images/{entry.name}", time.localtime(st.st_mtime)[:6])
+                zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+                zinfo.file_size = st.st_size
+                zinfo.compress_type = (
+                    zipfile.ZIP_STORED
+                    if os.path.splitext(entry.name)[1].lower() in STORED_IMAGE_SUFFIXES
+                    else zipfile.ZIP_DEFLATED
+                )
+                # A ZipInfo does not inherit the archive's compresslevel, so pass it here
+                zipf.writestr(zinfo, data, compresslevel=HTML_COMPRESS_LEVEL)
 
-    return zip_path
+        # Closing the archive writes the central directory; the file position then is its size
+        zipf.close()
+        zip_size = zip_fp.tell()
 
-def handle_convert(pdf_file, output_dir, no_images, no_toc, keep_toc_pages):
+    try:
+        with open(fingerprint_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "zip_size": zip_size}, f)
+    except OSError:
+        pass  # the ZIP is still valid, it just gets rebuilt next time
+
+    return zip_path, zip_size
+
+def split_output_markers(chunk):
+    """Split converter output into (display text, reported output paths).
+
+    Lines starting with the converter's --report-outputs marker are removed
+    from the text and returned as paths instead.
+    """
+    text = []
+    paths = []
+    for line in chunk.splitlines(keepends=True):
+        if line.startswith(converter.OUTPUT_MARKER):
+            paths.append(Path(line[len(converter.OUTPUT_MARKER):].rstrip("\r\n")))
+        else:
+            text.append(line)
+    return "".join(text), paths
+
+def pdf_digest(pdf_path):
+    """Hex digest of a PDF's bytes, read in 1 MiB blocks."""
+    hasher = _pdf_hasher()
+    with open(pdf_path, "rb") as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def result_key(digest, no_images, no_toc, keep_toc_pages, batch=False, target=None):
+    """Cache key for a PDF digest converted with the given options by this converter version.
+
+    target names what the run writes (e.g. the upload name and output path);
+    it is hashed into the key so identical bytes under another name get their own entry.
+    """
+    flags = f"{int(bool(no_images))}{int(bool(no_toc))}{int(bool(keep_toc_pages))}"
+    key = f"{digest}-{flags}{'b' if batch else ''}-{CONVERTER_VERSION}"
+    if target is not None:
+        key += "-" + hashlib.blake2b(target.encode("utf-8"), digest_size=8).hexdigest()
+    return key
+
+def single_output_html(pdf_path, output_dir):
+    """The HTML path the converter writes for a single (non-batch) conversion."""
+    output_path = Path(_abs(output_dir)).resolve()
+    if output_path.suffix.lower() == ".html":
+        return output_path
+    return output_path / f"{Path(pdf_path).stem}.html"
+
+def _images_fingerprint(images_dir):
+    """Sorted [name, size, mtime_ns] of the files in images_dir; empty if it is missing."""
+    fingerprint = []
+    try:
+        with os.scandir(images_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    fingerprint.append([entry.name, st.st_size, st.st_mtime_ns])
+    except OSError:
+        return []
+    fingerprint.sort()
+    return fingerprint
+
+def _remember_result(cache_key, entry):
+    with _RESULT_CACHE_LOCK:
+        _result_cache[cache_key] = entry
+        _result_cache.move_to_end(cache_key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+def lookup_cached_result(output_dir, key, html_file=None, images_dir=None):
+    """Return the cached HTML path for key, or None if missing or modified since.
+
+    When given, the entry must be for html_file, and the files in images_dir must be
+    the ones recorded with it (the images folder is shared and later runs overwrite it).
+    """
+    cache_key = (_abs(output_dir), key)
+    entry = _result_cache.get(cache_key)
+    if entry is None:
+        try:
+            with open(os.path.join(output_dir, RESULT_CACHE_DIR, f"{key}.json"), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+    try:
+        st = os.stat(entry["html"])
+    except OSError:
+        st = None
+    # A later conversion of a different PDF with the same name overwrites the HTML
+    if (
+        st is None
+        or (st.st_size, st.st_mtime_ns) != (entry["size"], entry["mtime_ns"])
+        or (html_file is not None and entry["html"] != str(html_file))
+        or (images_dir is not None and entry.get("images") != _images_fingerprint(images_dir))
+    ):
+        with _RESULT_CACHE_LOCK:
+            _result_cache.pop(cache_key, None)
+        return None
+    _remember_result(cache_key, entry)
+    return Path(entry["html"])
+
+def store_cached_result(output_dir, key, html_file, html_stat, images_dir=None):
+    """Remember html_file (and the files in images_dir) as the result for key, in memory and in the sidecar file."""
+    entry = {"html": str(html_file), "size": html_stat.st_size, "mtime_ns": html_stat.st_mtime_ns}
+    if images_dir is not None:
+        entry["images"] = _images_fingerprint(images_dir)
+    cache_key = (_abs(output_dir), key)
+    _remember_result(cache_key, entry)
+    try:
+        cache_dir = os.path.join(output_dir, RESULT_CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+    except OSError:
+        pass  # the in-memory entry still works for this session
+
+async def handle_convert(pdf_file, output_dir, no_images, no_toc, keep_toc_pages, workers=1):
     """Handle single PDF conversion."""
     if not pdf_file:
-        return "❌ No PDF file selected", gr.update(value=None, visible=False)
+        yield "❌ No PDF file selected", gr.update(value=None, visible=False)
+        return
 
     pdf_path = pdf_file.name
-    stdout, stderr, returncode = convert_pdf(pdf_path, output_dir, no_images, no_toc, keep_toc_pages)
+    log = ""
+    output_paths = []
+    returncode = None
+    yield CONVERT_PROGRESS_TMPL.format(pdf=pdf_path, log=""), gr.update(value=None, visible=False)
+
+    # The upload name decides the output file (and appears in the HTML), so it is part of the key
+    digest = await asyncio.to_thread(pdf_digest, pdf_path)
+    expected_html = single_output_html(pdf_path, output_dir)
+    images_dir = None if no_images else expected_html.parent / "images"
+    cache_key = result_key(
+        digest, no_images, no_toc, keep_toc_pages, target=f"{Path(pdf_path).name}\0{expected_html}"
+    )
+    cached_file = await asyncio.to_thread(lookup_cached_result, output_dir, cache_key, expected_html, images_dir)
+    if cached_file:
+        log = CONVERT_CACHED_LOG
+        output_paths.append(cached_file)
+        returncode = 0
+    else:
+        async for chunk, returncode in convert_pdf(
+            pdf_path, output_dir, no_images, no_toc, keep_toc_pages, min(int(workers), MAX_PAGE_WORKERS)
+        ):
+            if chunk:
+                text, paths = split_output_markers(chunk)
+                output_paths.extend(paths)
+                log = (log + text)[-LOG_TAIL_CHARS:]
+                yield CONVERT_PROGRESS_TMPL.format(pdf=pdf_path, log=log), gr.update(value=None, visible=False)
 
     if returncode != 0:
-        return (
-            "❌ Conversion failed!\n"
-            f"📄 Input: `{pdf_path}`\n"
-            f"📁 Output dir: `{output_dir}`\n"
-            f"🔴 Exit code: {returncode}\n"
-            f"❓ Error output:\n{stderr}\n"
-            f"📝 Standard output:\n{stdout}"
+        yield CONVERT_FAILED_TMPL.format(
+            pdf=pdf_path, out=output_dir, code=returncode, log=log
         ), gr.update(value=None, visible=False)
+        return
 
     output_dir_path = Path(output_dir)
-    pdf_name = Path(pdf_path).stem
-    output_files = sorted(
-        output_dir_path.glob(f"{pdf_name}*.html"),
-        key=lambda item: item.stat().st_mtime,
-        reverse=True
-    )
-    output_file = output_files[0] if output_files else None
-
+    output_file = output_paths[-1] if output_paths else None
+    output_stat = None
     if output_file:
-        file_size = output_file.stat().st_size / 1024
-
-        # Create ZIP with images if they exist
-        download_file = create_zip_with_images(output_file, output_dir_path)
+        # One stat answers both "does it exist" and "how big is it"
+        try:
+            output_stat = os.stat(output_file)
+        except FileNotFoundError:
+            pass
+
+    if output_stat:
+        if not cached_file:
+            await asyncio.to_thread(store_cached_result, output_dir, cache_key, output_file, output_stat, images_dir)
+        file_size = output_stat.st_size / 1024
+
+        # Create ZIP with images if they exist; reading and deflating happens off the event loop
+        download_file, zip_size = await asyncio.to_thread(
+            create_zip_with_images, output_file, output_dir_path, output_stat
+        )
 
         # If we created a ZIP, use that for download
-        if download_file != output_file:
-            file_size_zip = download_file.stat().st_size / 1024
-            status_text = (
-                "✅ Conversion complete!\n\n"
-                f"📄 Input: `{pdf_path}`\n"
-                f"📁 Output: `{output_file.name}`\n"
-                f"📦 Download: `{download_file.name}` (HTML + images)\n"
-                f"📊 Size: {file_size:.1f} KB (HTML), {file_size_zip:.1f} KB (ZIP)\n\n"
-                f"📝 Log:\n{stdout}\n\n"
-                "📥 File ready for download below! (ZIP contains HTML + images folder)"
+        if zip_size is not None:
+            file_size_zip = zip_size / 1024
+            status_text = CONVERT_OK_ZIP_TMPL.format(
+                pdf=pdf_path, html=output_file.name, zip=download_file.name,
+                html_kb=file_size, zip_kb=file_size_zip, log=log
             )
         else:
-            status_text = (
-                "✅ Conversion complete!\n\n"
-                f"📄 Input: `{pdf_path}`\n"
-                f"📁 Output: `{output_file.name}`\n"
-                f"📊 Size: {file_size:.1f} KB\n\n"
-                f"📝 Log:\n{stdout}\n\n"
-                "📥 File ready for download below!"
+            status_text = CONVERT_OK_TMPL.format(
+                pdf=pdf_path, html=output_file.name, html_kb=file_size, log=log
             )
 
-        return status_text, gr.update(value=str(download_file), visible=True)
+        yield status_text, gr.update(value=str(download_file), visible=True)
     else:
-        return (
-            "❌ Output file not found!\n\n"
-            f"📄 Input: `{pdf_path}`\n"
-            f"📁 Output directory: `{output_dir_path}`\n\n"
-            f"Searched for: {pdf_name}*.html"
+        yield CONVERT_NOT_FOUND_TMPL.format(
+            pdf=pdf_path, out=output_dir_path, log=log
         ), gr.update(value=None, visible=False)
 
-def handle_batch(folder_path, output_dir, no_images, no_toc, keep_toc_pages):
+async def handle_batch(folder_path, output_dir, no_images, no_toc, keep_toc_pages):
     """Handle batch folder conversion."""
     if not folder_path:
-        return "❌ No folder path provided", gr.update(value=None, visible=False)
+        yield "❌ No folder path provided", gr.update(value=None, visible=False)
+        return
 
     folder = folder_path.strip()
 
     if not os.path.isdir(folder):
-        return f"❌ Folder not found: {folder}", gr.update(value=None, visible=False)
-
-    stdout, stderr, returncode = convert_folder(folder_path, output_dir, no_images, no_toc, keep_toc_pages)
+        yield f"❌ Folder not found: {folder}", gr.update(value=None, visible=False)
+        return
+
+    log = ""
+    output_paths = []
+    returncode = None
+    yield BATCH_PROGRESS_TMPL.format(folder=folder, log=""), gr.update(value=None, visible=False)
+    async for chunk, returncode in convert_folder(folder_path, output_dir, no_images, no_toc, keep_toc_pages):
+        if chunk:
+            text, paths = split_output_markers(chunk)
+            output_paths.extend(paths)
+            log = (log + text)[-LOG_TAIL_CHARS:]
+            yield BATCH_PROGRESS_TMPL.format(folder=folder, log=log), gr.update(value=None, visible=False)
 
     if returncode != 0:
-        return (
-            "❌ Batch conversion failed!\n\n"
-            f"📁 Input folder: `{folder}`\n"
-            f"📁 Output dir: `{output_dir}`\n"
-            f"🔴 Exit code: {returncode}\n"
-            f"❓ Error output:\n{stderr}\n"
-            f"📝 Standard output:\n{stdout}"
+        yield BATCH_FAILED_TMPL.format(
+            folder=folder, out=output_dir, code=returncode, log=log
         ), gr.update(value=None, visible=False)
+        return
 
     output_dir_path = Path(output_dir)
-    html_files = list(output_dir_path.glob("**/index.html"))
-
-    if html_files:
-        return (
-            "✅ Batch conversion complete!\n\n"
-            f"📁 Folder: {folder}\n"
-            f"📁 Output: {output_dir}\n"
-            f"📊 Generated: {len(html_files)} HTML files\n\n"
-            f"📝 Log:\n{stdout}\n\n"
-            "📥 Browse output directory for individual files"
+    html_count = len(output_paths)
+
+    if html_count:
+        yield BATCH_OK_TMPL.format(
+            folder=folder, out=output_dir, count=html_count, log=log
         ), gr.update(value=None, visible=False)
     else:
-        return (
-            "❌ No HTML files found in output directory!\n\n"
-            f"📁 Input folder: {folder}\n"
-            f"📁 Output directory: `{output_dir_path}`\n"
-            f"📝 Log:\n{stdout}\n"
-            f"❓ Error output:\n{stderr}"
+        yield BATCH_EMPTY_TMPL.format(
+            folder=folder, out=output_dir_path, log=log
         ), gr.update(value=None, visible=False)
 
 if __name__ == "__main__":
+    # Importing the converter above already failed loudly if the script is missing
     print(f"✅ Converter found: {CONVERTER_SCRIPT}")
+    if not USE_SUBPROCESS:
+        # Pay PyMuPDF's import and first-use setup now rather than on the first click
+        converter.warmup()
     demo = create_ui()
+    # Gradio runs one event at a time per handler by default; let several users convert at once
+    demo.queue(default_concurrency_limit=MAX_BATCH_WORKERS, max_size=64)
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -4,24 +4,31 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import io
 import json
+import multiprocessing
 import os
 import re
-import statistics
+import sys
+import traceback
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from html import escape
+from itertools import repeat
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class Line:
     text: str
     size: float
     is_bold: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     kind: str
     text: str | None = None
@@ -32,13 +39,22 @@ class Node:
     caption: str | None = None
     page: int | None = None
     node_id: str | None = None
+    # HTML-escaped heading text and id, shared by the TOC and the body
+    escaped_text: str | None = None
+    escaped_id: str | None = None
 
 
 HEADING_RE = re.compile(r"^(\d+(?:\.\d+)*)(?:\.|\))\s+(.+)$")
 BULLET_RE = re.compile(r"^\s*[\u2022\u2023\u25E6\u2043\u2219\-\u2013\u2014]\s+")
 FIG_RE = re.compile(r"^(Obr\.|Fig\.|Figure)\s*\d+", re.IGNORECASE)
 LEADER_RE = re.compile(r"(?:\s+(?:\.{3,}|(?:·\s*){3,}|(?:•\s*){3,}|(?:⋅\s*){3,}))\s*\d+\s*$")
+SLUG_DASH_RE = re.compile(r"-+")
 TOC_LEADER_MIN = 5
+LEADER_CHARS = ("...", "·", "•", "⋅")
+MIN_PAGES_PER_WORKER = 8
+PROGRESS_EVERY_PAGES = 10
+IMAGE_WRITE_WORKERS = 4
+OUTPUT_MARKER = "###OUTPUT### "
 
 
 STYLE_BLOCK = """
@@ -132,26 +148,69 @@ figure figcaption {
 """.strip()
 
 
+class SlugTable(dict):
+    """str.translate table for slugify: whitespace -> "-", keep [a-z0-9-], drop the rest.
+
+    Entries are filled in on first sight of each code point, so the table only
+    holds characters that actually occur.
+    """
+
+    KEEP = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-")
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        char = chr(codepoint)
+        value = "-" if char.isspace() else (char if char in self.KEEP else None)
+        self[codepoint] = value
+        return value
+
+
+SLUG_TABLE = SlugTable()
+
+
 def slugify(text: str, fallback: str) -> str:
-    raw = re.sub(r"\s+", "-", text.strip().lower())
-    raw = re.sub(r"[^a-z0-9\-]", "", raw)
-    raw = re.sub(r"-+", "-", raw).strip("-")
+    raw = text.lower().translate(SLUG_TABLE)
+    raw = SLUG_DASH_RE.sub("-", raw).strip("-")
     return raw or fallback
 
 
 def unique_slug(text: str, fallback: str, seen: dict) -> str:
     base = slugify(text, fallback)
-    if base not in seen:
-        seen[base] = 1
-        return base
-    seen[base] += 1
-    return f"{base}-{seen[base]}"
+    count = seen.get(base, 0) + 1
+    seen[base] = count
+    return base if count == 1 else f"{base}-{count}"
 
 
 def median(values: List[float], default: float = 12.0) -> float:
-    if not values:
+    # Called once per text line with a handful of span sizes, where statistics.median's
+    # type handling costs more than the sort; the result is the same
+    count = len(values)
+    if not count:
+        return default
+    if count == 1:
+        return values[0]
+    ordered = sorted(values)
+    mid = count // 2
+    if count % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def median_of_counts(counts: Counter, default: float = 12.0) -> float:
+    # Same result as median() over the expanded values, from a value -> count histogram
+    total = sum(counts.values())
+    if not total:
         return default
-    return statistics.median(values)
+    low_rank = (total - 1) // 2
+    high_rank = total // 2
+    low = None
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if low is None and seen > low_rank:
+            low = value
+        if seen > high_rank:
+            return value if total % 2 else (low + value) / 2
+    return default
 
 
 def load_metadata(path: Optional[str]) -> dict:
@@ -163,10 +222,10 @@ def load_metadata(path: Optional[str]) -> dict:
     return data
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Convert PDFs to semantic HTML with SEO-friendly markup.")
-    parser.add_argument("input", help="PDF file or directory containing PDFs")
+    parser.add_argument("input", nargs="?", help="PDF file or directory containing PDFs")
     parser.add_argument("--out", default="out", help="Output directory or HTML file")
     parser.add_argument("--batch", action="store_true", help="Force batch mode for directories")
     parser.add_argument("--recursive", action="store_true", help="Search PDF files recursively")
@@ -183,7 +242,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--description", help="Short description / abstract")
     parser.add_argument("--keywords", help="Comma-separated keywords")
     parser.add_argument("--metadata", help="Path to JSON metadata overrides")
-    return parser.parse_args()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to extract page text from each PDF")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Processes used to convert PDFs in parallel in batch mode")
+    parser.add_argument("--progress", action="store_true",
+                        help=f"Print a progress line every {PROGRESS_EVERY_PAGES} pages")
+    parser.add_argument("--report-outputs", action="store_true",
+                        help=f"Print a machine-readable '{OUTPUT_MARKER.strip()} <path>' line per converted file")
+    parser.add_argument("--server", action="store_true",
+                        help="Serve JSON-line conversion requests on stdin until EOF")
+    args = parser.parse_args(argv)
+    if args.input is None and not args.server:
+        parser.error("the following arguments are required: input")
+    return args
 
 
 def require_fitz():
@@ -196,21 +268,37 @@ def require_fitz():
     return fitz
 
 
+def warmup() -> None:
+    """Import PyMuPDF and extract a throwaway page so the first real conversion skips that setup."""
+    fitz = require_fitz()
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), "warmup")
+        page.get_text("dict")
+
+
+def iter_pdf_files(root: Path, recursive: bool) -> Iterator[str]:
+    # os.scandir reuses dirent types, so no Path objects or extra stats per entry
+    stack = [str(root)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except PermissionError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_file():
+                    if entry.name.lower().endswith(".pdf"):
+                        yield entry.path
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+
+
 def collect_pdf_paths(input_path: Path, recursive: bool) -> List[Path]:
     if input_path.is_file() and input_path.suffix.lower() == ".pdf":
         return [input_path]
     if input_path.is_dir():
-        if recursive:
-            return sorted(
-                path
-                for path in input_path.rglob("*")
-                if path.is_file() and path.suffix.lower() == ".pdf"
-            )
-        return sorted(
-            path
-            for path in input_path.iterdir()
-            if path.is_file() and path.suffix.lower() == ".pdf"
-        )
+        return sorted(Path(path) for path in iter_pdf_files(input_path, recursive))
     return []
 
 
@@ -243,17 +331,18 @@ def extract_lines_from_block(block: dict) -> List[Line]:
 def merge_lines(lines: List[Line]) -> str:
     if not lines:
         return ""
-    merged = lines[0].text
+    # Collect pieces and join once; a hyphenated line break glues onto the last piece
+    parts = [lines[0].text]
     for idx in range(1, len(lines)):
         prev = lines[idx - 1].text
         current = lines[idx].text
         if not current:
             continue
         if prev.endswith("-") and current[:1].islower():
-            merged = merged[:-1] + current
+            parts[-1] = parts[-1][:-1] + current
             continue
-        merged += " " + current
-    return merged.strip()
+        parts.append(current)
+    return " ".join(parts).strip()
 
 
 def strip_leader_dots(text: str, enabled: bool) -> Tuple[str, bool]:
@@ -275,23 +364,48 @@ def page_looks_like_toc(blocks: List[dict]) -> bool:
                 if text:
                     parts.append(text)
             line_text = "".join(parts).strip()
-            if line_text and LEADER_RE.search(line_text):
+            # LEADER_RE needs a trailing page number and a run of leader characters;
+            # checking for those with string methods first skips the regex on most lines
+            if not line_text[-1:].isdigit():
+                continue
+            if not any(leader in line_text for leader in LEADER_CHARS):
+                continue
+            if LEADER_RE.search(line_text):
                 count += 1
                 if count >= TOC_LEADER_MIN:
                     return True
     return False
 
 
-def detect_heading(line: Line, body_size: float, level_hint: Optional[int]) -> Optional[int]:
-    match = HEADING_RE.match(line.text)
-    if match:
-        depth = len(match.group(1).split("."))
-        return min(6, depth + 1)
-    if line.size >= body_size * 1.8:
+def numbered_heading_level(text: str) -> Optional[int]:
+    # HEADING_RE needs a leading digit, so most lines are rejected without running it
+    # (isdigit() accepts every character \d does)
+    if not text[:1].isdigit():
+        return None
+    match = HEADING_RE.match(text)
+    if not match:
+        return None
+    depth = match.group(1).count(".") + 1
+    return min(6, depth + 1)
+
+
+def heading_thresholds(body_size: float) -> Tuple[float, float, float]:
+    # Font sizes from which a line counts as a level 1, 2 or 3 heading
+    return body_size * 1.8, body_size * 1.4, body_size * 1.2
+
+
+def detect_heading(
+    line: Line, thresholds: Tuple[float, float, float], level_hint: Optional[int]
+) -> Optional[int]:
+    level = numbered_heading_level(line.text)
+    if level:
+        return level
+    h1_size, h2_size, h3_size = thresholds
+    if line.size >= h1_size:
         return 1 if level_hint == 0 else 2
-    if line.size >= body_size * 1.4:
+    if line.size >= h2_size:
         return 2
-    if line.size >= body_size * 1.2 and len(line.text) <= 120:
+    if line.size >= h3_size and len(line.text) <= 120:
         return 3
     return None
 
@@ -305,38 +419,112 @@ def extract_title_candidate(lines: List[Line], body_size: float) -> Optional[str
     return None
 
 
+def page_text_dict(page, flags: int) -> Tuple[dict, bool]:
+    """Return a page's text dict without image payloads, and whether the page has images."""
+    textpage = page.get_textpage(flags=flags)
+    # Listing image blocks is nearly free; encoding them (extractDICT) is what costs
+    if not textpage.extractIMGINFO():
+        return textpage.extractDICT(), False
+    return page.get_text("dict", flags=flags & ~require_fitz().TEXT_PRESERVE_IMAGES), True
+
+
+def pool_context() -> multiprocessing.context.BaseContext:
+    """Multiprocessing context for worker pools: forkserver where available.
+
+    Forking a multi-threaded host (the Gradio app runs conversions on threads) can
+    deadlock the child; forkserver workers start from a small single-threaded server.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, flags: int) -> List[Tuple[dict, bool]]:
+    fitz = require_fitz()
+    with fitz.open(pdf_path) as doc:
+        return [page_text_dict(doc[index], flags) for index in range(start, stop)]
+
+
+def iter_page_dicts(doc, pdf_path: Path, workers: int, flags: int) -> Iterator[Tuple[dict, bool]]:
+    """Yield page_text_dict() for every page, in page order."""
+    page_count = len(doc)
+    # Short documents are not worth the cost of starting worker processes
+    workers = min(workers, page_count // MIN_PAGES_PER_WORKER)
+    if workers <= 1:
+        for page in doc:
+            yield page_text_dict(page, flags)
+        return
+    # PyMuPDF is not thread-safe, so each worker process opens its own copy of the
+    # document and extracts one contiguous page range
+    step = -(-page_count // workers)
+    starts = list(range(0, page_count, step))
+    stops = [min(start + step, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=len(starts), mp_context=pool_context()) as pool:
+        for chunk in pool.map(_extract_page_range, repeat(str(pdf_path)), starts, stops, repeat(flags)):
+            yield from chunk
+
+
+def report_progress(page_dicts: Iterable[Tuple[dict, bool]], page_count: int) -> Iterator[Tuple[dict, bool]]:
+    for page_no, text_dict in enumerate(page_dicts, start=1):
+        yield text_dict
+        if page_no % PROGRESS_EVERY_PAGES == 0 or page_no == page_count:
+            print(f"Processed page {page_no}/{page_count}", flush=True)
+
+
+def block_sort_key(block: dict) -> Tuple[float, float]:
+    # Reading order: top to bottom, then left to right
+    x0, y0 = (block.get("bbox") or (0, 0))[:2]
+    return y0, x0
+
+
 def build_nodes(
     doc,
+    page_dicts: Iterable[dict],
     body_size: float,
     include_images: bool,
     title_line: Optional[str],
     image_dir: Optional[Path],
     include_toc_pages: bool,
+    image_pool: Optional[Executor] = None,
 ) -> List[Node]:
     nodes: List[Node] = []
     image_counter = 0
+    image_writes: List[Future] = []
+    image_dir_ready = False
+    thresholds = heading_thresholds(body_size)
     heading_count = 0
-    pending_text: Optional[str] = None
+    pending_parts: List[str] = []
     pending_page: Optional[int] = None
     pending_y1: Optional[float] = None
     pending_size: Optional[float] = None
 
+    def save_image(filename: Path, image_bytes: bytes) -> None:
+        # Extraction must stay on this thread (PyMuPDF is not thread-safe), but the
+        # file writes can overlap with it when a pool is given
+        nonlocal image_dir_ready
+        if not image_dir_ready:
+            image_dir.mkdir(parents=True, exist_ok=True)
+            image_dir_ready = True
+        if image_pool is None:
+            filename.write_bytes(image_bytes)
+        else:
+            image_writes.append(image_pool.submit(filename.write_bytes, image_bytes))
+
     def flush_pending() -> None:
-        nonlocal pending_text, pending_page, pending_y1, pending_size
-        if pending_text and pending_page is not None:
-            nodes.append(Node(kind="p", text=pending_text, page=pending_page))
-        pending_text = None
+        nonlocal pending_parts, pending_page, pending_y1, pending_size
+        if pending_parts and pending_page is not None:
+            nodes.append(Node(kind="p", text=" ".join(pending_parts), page=pending_page))
+        pending_parts = []
         pending_page = None
         pending_y1 = None
         pending_size = None
 
     def add_line(text: str, size: float, y0: float, y1: float, page_number: int) -> None:
-        nonlocal pending_text, pending_page, pending_y1, pending_size
+        nonlocal pending_parts, pending_page, pending_y1, pending_size
         if not text:
             return
-        if pending_text is None or pending_page != page_number:
+        if not pending_parts or pending_page != page_number:
             flush_pending()
-            pending_text = text
+            pending_parts = [text]
             pending_page = page_number
             pending_y1 = y1
             pending_size = size
@@ -346,24 +534,23 @@ def build_nodes(
         threshold = max(2.0, (pending_size or size) * 0.9)
         if gap > threshold:
             flush_pending()
-            pending_text = text
+            pending_parts = [text]
             pending_page = page_number
             pending_y1 = y1
             pending_size = size
             return
 
-        if pending_text.endswith("-") and text[:1].islower():
-            pending_text = pending_text[:-1] + text
+        # Paragraph text is joined once in flush_pending()
+        if pending_parts[-1].endswith("-") and text[:1].islower():
+            pending_parts[-1] = pending_parts[-1][:-1] + text
         else:
-            pending_text = pending_text + " " + text
+            pending_parts.append(text)
         pending_y1 = y1
         pending_size = size
 
-    for page_index in range(len(doc)):
-        page = doc[page_index]
-        text_dict = page.get_text("dict")
+    for page_index, text_dict in enumerate(page_dicts):
         blocks = list(text_dict.get("blocks", []))
-        blocks.sort(key=lambda blk: ((blk.get("bbox") or [0, 0, 0, 0])[1], (blk.get("bbox") or [0, 0, 0, 0])[0]))
+        blocks.sort(key=block_sort_key)
         page_is_toc = page_looks_like_toc(blocks)
         if page_is_toc and not include_toc_pages:
             continue
@@ -383,9 +570,8 @@ def build_nodes(
                     continue
                 image_counter += 1
                 if image_dir is not None:
-                    image_dir.mkdir(parents=True, exist_ok=True)
                     filename = image_dir / f"page-{page_index+1:03d}-img-{image_counter:03d}.{ext}"
-                    filename.write_bytes(image_bytes)
+                    save_image(filename, image_bytes)
                 nodes.append(Node(
                     kind="figure",
                     src=f"images/page-{page_index+1:03d}-img-{image_counter:03d}.{ext}",
@@ -405,10 +591,16 @@ def build_nodes(
             if title_line and lines[0].text == title_line:
                 # Skip title line if used as h1
                 continue
-            # Detect list items
-            if all(BULLET_RE.match(ln.text) for ln in lines):
+            # Detect list items; keep the matches so the bullet is sliced off, not matched again
+            bullet_matches = []
+            for ln in lines:
+                match = BULLET_RE.match(ln.text)
+                if match is None:
+                    break
+                bullet_matches.append(match)
+            else:
                 flush_pending()
-                items = [BULLET_RE.sub("", ln.text).strip() for ln in lines]
+                items = [match.string[match.end():].strip() for match in bullet_matches]
                 nodes.append(Node(kind="ul", items=items, page=page_index + 1))
                 continue
             if len(lines) == 1:
@@ -416,7 +608,7 @@ def build_nodes(
                 if had_leader:
                     add_line(cleaned_text, lines[0].size, block_y0, block_y1, page_index + 1)
                     continue
-                level = detect_heading(lines[0], body_size, level_hint=heading_count)
+                level = detect_heading(lines[0], thresholds, level_hint=heading_count)
                 if level:
                     flush_pending()
                     nodes.append(Node(kind="heading", text=cleaned_text, level=level, page=page_index + 1))
@@ -433,10 +625,9 @@ def build_nodes(
                 if had_leader:
                     nodes.append(Node(kind="p", text=cleaned_paragraph, page=page_index + 1))
                     continue
-                match = HEADING_RE.match(cleaned_paragraph)
-                if match:
-                    depth = len(match.group(1).split("."))
-                    nodes.append(Node(kind="heading", text=cleaned_paragraph, level=min(6, depth + 1), page=page_index + 1))
+                level = numbered_heading_level(cleaned_paragraph)
+                if level:
+                    nodes.append(Node(kind="heading", text=cleaned_paragraph, level=level, page=page_index + 1))
                     heading_count += 1
                     continue
                 nodes.append(Node(kind="p", text=cleaned_paragraph, page=page_index + 1))
@@ -453,6 +644,11 @@ def build_nodes(
     # Fallback: if no figures detected from blocks, extract page images
     if include_images and image_dir is not None and not any(node.kind == "figure" for node in nodes):
         fallback_counter = 0
+        # Each page's images go after that page's last node (or at the end if it has
+        # none); collect them per position and rebuild the list once
+        last_idx_by_page = {node.page: idx for idx, node in enumerate(nodes)}
+        figures_after: dict = {}
+        trailing_figures: List[Node] = []
         for page_index in range(len(doc)):
             page = doc[page_index]
             page_no = page_index + 1
@@ -473,11 +669,11 @@ def build_nodes(
                     xref = img[0]
                     image_items.append((0.0, xref))
             image_items.sort(key=lambda item: item[0])
-            insert_at = len(nodes)
-            for idx in range(len(nodes) - 1, -1, -1):
-                if nodes[idx].page == page_no:
-                    insert_at = idx + 1
-                    break
+            last_idx = last_idx_by_page.get(page_no)
+            if last_idx is None:
+                page_figures = trailing_figures
+            else:
+                page_figures = figures_after.setdefault(last_idx, [])
             for _, xref in image_items:
                 image = doc.extract_image(xref)
                 image_bytes = image.get("image")
@@ -486,16 +682,24 @@ def build_nodes(
                 ext = image.get("ext", "png")
                 fallback_counter += 1
                 filename = image_dir / f"page-{page_no:03d}-img-{fallback_counter:03d}.{ext}"
-                image_dir.mkdir(parents=True, exist_ok=True)
-                filename.write_bytes(image_bytes)
-                nodes.insert(insert_at, Node(
+                save_image(filename, image_bytes)
+                page_figures.append(Node(
                     kind="figure",
                     src=f"images/page-{page_no:03d}-img-{fallback_counter:03d}.{ext}",
                     alt=f"Figure {fallback_counter} from page {page_no}",
                     caption=None,
                     page=page_no,
                 ))
-                insert_at += 1
+        if figures_after or trailing_figures:
+            merged: List[Node] = []
+            for idx, node in enumerate(nodes):
+                merged.append(node)
+                merged.extend(figures_after.get(idx, ()))
+            merged.extend(trailing_figures)
+            nodes = merged
+    # Surface any failed image write
+    for future in image_writes:
+        future.result()
     # Assign unique heading ids
     seen: dict = {}
     heading_count = 0
@@ -503,6 +707,8 @@ def build_nodes(
         if node.kind == "heading" and node.text:
             heading_count += 1
             node.node_id = unique_slug(node.text, f"section-{heading_count}", seen)
+            node.escaped_text = escape(node.text)
+            node.escaped_id = escape(node.node_id)
     return nodes
 
 
@@ -511,46 +717,55 @@ def build_toc(nodes: List[Node]) -> str:
     for node in nodes:
         if node.kind != "heading" or not node.text or not node.level:
             continue
-        node_id = node.node_id or slugify(node.text, "section")
+        escaped_id = node.escaped_id or escape(node.node_id or slugify(node.text, "section"))
+        escaped_text = node.escaped_text or escape(node.text)
         level = max(2, min(6, node.level))
         toc_entries.append(
-            f'<li data-level="{level}"><a href="#{escape(node_id)}">{escape(node.text)}</a></li>'
+            f'<li data-level="{level}"><a href="#{escaped_id}">{escaped_text}</a></li>'
         )
     if not toc_entries:
         return ""
     return "<ol>\n" + "\n".join(toc_entries) + "\n</ol>"
 
 
-def nodes_to_html(nodes: List[Node]) -> str:
-    html_parts: List[str] = []
+def write_nodes_html(nodes: List[Node], out: TextIO) -> None:
+    # Node fragments joined by newlines, written piece by piece instead of joined in memory
+    separator = ""
+    for part in iter_nodes_html(nodes):
+        out.write(separator)
+        out.write(part)
+        separator = "\n"
+
+
+def iter_nodes_html(nodes: List[Node]) -> Iterator[str]:
     section_stack: List[int] = []
     for node in nodes:
         if node.kind == "heading" and node.text and node.level:
-            node_id = node.node_id or slugify(node.text, "section")
+            escaped_id = node.escaped_id or escape(node.node_id or slugify(node.text, "section"))
+            escaped_text = node.escaped_text or escape(node.text)
             level = max(2, min(6, node.level))
             while section_stack and section_stack[-1] >= level:
-                html_parts.append("</section>")
+                yield "</section>"
                 section_stack.pop()
-            html_parts.append(f'<section data-page="{node.page}">')
-            html_parts.append(f'<h{level} id="{escape(node_id)}">{escape(node.text)}</h{level}>')
+            yield f'<section data-page="{node.page}">'
+            yield f'<h{level} id="{escaped_id}">{escaped_text}</h{level}>'
             section_stack.append(level)
         elif node.kind == "p" and node.text:
-            html_parts.append(f'<p data-page="{node.page}">{escape(node.text)}</p>')
+            yield f'<p data-page="{node.page}">{escape(node.text)}</p>'
         elif node.kind == "ul" and node.items:
-            html_parts.append(f'<ul data-page="{node.page}">')
+            yield f'<ul data-page="{node.page}">'
             for item in node.items:
-                html_parts.append(f"<li>{escape(item)}</li>")
-            html_parts.append("</ul>")
+                yield f"<li>{escape(item)}</li>"
+            yield "</ul>"
         elif node.kind == "figure" and node.src:
-            html_parts.append(f'<figure data-page="{node.page}">')
-            html_parts.append(f'<img src="{escape(node.src)}" alt="{escape(node.alt or "Figure")}">')
+            yield f'<figure data-page="{node.page}">'
+            yield f'<img src="{escape(node.src)}" alt="{escape(node.alt or "Figure")}">'
             if node.caption:
-                html_parts.append(f'<figcaption>{escape(node.caption)}</figcaption>')
-            html_parts.append("</figure>")
+                yield f'<figcaption>{escape(node.caption)}</figcaption>'
+            yield "</figure>"
     while section_stack:
-        html_parts.append("</section>")
+        yield "</section>"
         section_stack.pop()
-    return "\n".join(html_parts)
 
 
 def build_schema(metadata: dict, title: str, schema_type: str, images: List[str]) -> str:
@@ -577,7 +792,8 @@ def build_schema(metadata: dict, title: str, schema_type: str, images: List[str]
     return json.dumps(data, ensure_ascii=False, indent=2)
 
 
-def render_html(title: str, metadata: dict, toc_html: str, body_html: str, schema_json: str) -> str:
+def render_html_frame(title: str, metadata: dict, toc_html: str, schema_json: str) -> Tuple[str, str]:
+    # The page before and after the article body, so the body can be streamed in between
     description = metadata.get("description") or ""
     keywords_value = metadata.get("keywords") or ""
     if isinstance(keywords_value, list):
@@ -625,7 +841,7 @@ def render_html(title: str, metadata: dict, toc_html: str, body_html: str, schem
     </header>
     {toc_block}
     <article>
-      {body_html}
+      """, f"""
     </article>
     <footer class=\"footer-meta\">{footer_html}</footer>
   </main>
@@ -641,6 +857,8 @@ def convert_pdf(
     schema_type: str,
     include_toc: bool,
     include_toc_pages: bool,
+    workers: int = 1,
+    progress: bool = False,
 ) -> None:
     fitz = require_fitz()
     doc = fitz.open(pdf_path)
@@ -649,22 +867,39 @@ def convert_pdf(
         meta["author"] = pdf_meta.get("author")
     if not meta.get("title") and pdf_meta.get("title"):
         meta["title"] = pdf_meta.get("title")
-    span_sizes: List[float] = []
-    for page in doc:
-        for block in page.get_text("dict").get("blocks", []):
+    # Extract every page once; the body size scan, title scan and build_nodes share the
+    # dicts. They carry no image payloads, so keeping them all stays cheap. Without images
+    # the image blocks are not collected at all (build_nodes would ignore them).
+    flags = fitz.TEXTFLAGS_DICT
+    if not include_images:
+        flags &= ~fitz.TEXT_PRESERVE_IMAGES
+    pages: Iterable[Tuple[dict, bool]] = iter_page_dicts(doc, pdf_path, workers, flags)
+    if progress:
+        pages = report_progress(pages, len(doc))
+    page_dicts: List[dict] = []
+    image_pages = set()
+    for page_index, (text_dict, has_images) in enumerate(pages):
+        page_dicts.append(text_dict)
+        # TOC detection reads only text blocks, so a TOC page that build_nodes will drop
+        # is known here and its images are never fetched; its spans still count towards body_size
+        if has_images and (include_toc_pages or not page_looks_like_toc(text_dict.get("blocks", []))):
+            image_pages.add(page_index)
+
+    # Fonts come in a handful of sizes, so a histogram is far smaller than one entry per span
+    size_counts: Counter = Counter()
+    for text_dict in page_dicts:
+        for block in text_dict.get("blocks", []):
             if block.get("type") != 0:
                 continue
             for line in block.get("lines", []):
-                for span in line.get("spans", []):
-                    span_sizes.append(span.get("size", 0.0))
-    body_size = median(span_sizes, default=12.0)
+                size_counts.update(span.get("size", 0.0) for span in line.get("spans", []))
+    body_size = median_of_counts(size_counts, default=12.0)
 
     # Title candidate from first page
     title_line = None
-    if len(doc) > 0:
-        first_page = doc[0]
+    if page_dicts:
         first_lines = []
-        for block in first_page.get_text("dict").get("blocks", []):
+        for block in page_dicts[0].get("blocks", []):
             if block.get("type") != 0:
                 continue
             first_lines.extend(extract_lines_from_block(block))
@@ -674,17 +909,24 @@ def convert_pdf(
     meta.setdefault("title", title)
 
     image_dir = output_html.parent / "images" if include_images else None
-    nodes = build_nodes(
-        doc,
-        body_size,
-        include_images,
-        title_line if title_line == title else None,
-        image_dir,
-        include_toc_pages=include_toc_pages,
+    # Only pages with images (that are kept) are extracted again, one at a time, for their payloads
+    full_page_dicts = (
+        doc[index].get_text("dict") if index in image_pages else text_dict
+        for index, text_dict in enumerate(page_dicts)
     )
+    with ThreadPoolExecutor(max_workers=IMAGE_WRITE_WORKERS) as image_pool:
+        nodes = build_nodes(
+            doc,
+            full_page_dicts,
+            body_size,
+            include_images,
+            title_line if title_line == title else None,
+            image_dir,
+            include_toc_pages=include_toc_pages,
+            image_pool=image_pool,
+        )
 
     toc_html = "" if not include_toc else build_toc(nodes)
-    body_html = nodes_to_html(nodes)
 
     # Collect image paths for schema
     images = []
@@ -692,9 +934,12 @@ def convert_pdf(
         images = [node.src for node in nodes if node.kind == "figure" and node.src]
 
     schema_json = build_schema(meta, title, schema_type, images)
-    html = render_html(title, meta, toc_html, body_html, schema_json)
+    head, tail = render_html_frame(title, meta, toc_html, schema_json)
     output_html.parent.mkdir(parents=True, exist_ok=True)
-    output_html.write_text(html, encoding="utf-8")
+    with output_html.open("w", encoding="utf-8", buffering=1 << 20) as out:
+        out.write(head)
+        write_nodes_html(nodes, out)
+        out.write(tail)
 
 
 def apply_overrides(args: argparse.Namespace, meta: dict) -> dict:
@@ -714,8 +959,92 @@ def apply_overrides(args: argparse.Namespace, meta: dict) -> dict:
     return meta
 
 
-def main() -> None:
-    args = parse_args()
+def run(argv: List[str], stream: Optional[TextIO] = None) -> Tuple[str, int]:
+    """Run main() with CLI arguments, returning its combined output and exit code.
+
+    When a stream is given, output is written to it as it is produced and the
+    returned output is empty.
+    """
+    output = stream if stream is not None else io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            main(argv)
+        except SystemExit as exc:
+            # Mirror the interpreter: None is success, ints are exit codes, anything else is a message
+            if isinstance(exc.code, int):
+                returncode = exc.code
+            elif exc.code is not None:
+                print(exc.code, file=sys.stderr)
+                returncode = 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    return ("" if stream is not None else output.getvalue()), returncode
+
+
+class LineWriter(io.TextIOBase):
+    """Text stream that hands each complete line to _send(); flush() sends a trailing partial line."""
+
+    def __init__(self) -> None:
+        self._partial = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).splitlines(keepends=True)
+        self._partial = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        for line in lines:
+            self._send(line)
+        return len(text)
+
+    def flush(self) -> None:
+        if self._partial:
+            self._send(self._partial)
+            self._partial = ""
+
+    def _send(self, text: str) -> None:
+        raise NotImplementedError
+
+
+class _JsonLinesWriter(LineWriter):
+    """Line stream that sends each line to out as an {"output": line} message."""
+
+    def __init__(self, out: TextIO):
+        super().__init__()
+        self._out = out
+
+    def _send(self, text: str) -> None:
+        self._out.write(json.dumps({"output": text}) + "\n")
+        self._out.flush()
+
+
+def serve() -> None:
+    # One request per line: {"args": [...]}. Output streams back as {"output": "..."}
+    # lines, and a final {"output": "", "returncode": 0} ends the reply.
+    out = sys.stdout
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            args = json.loads(line)["args"]
+        except (ValueError, KeyError, TypeError):
+            out.write(json.dumps({"output": "Malformed request\n", "returncode": 2}) + "\n")
+            out.flush()
+            continue
+        writer = _JsonLinesWriter(out)
+        _, returncode = run(args, writer)
+        writer.flush()
+        out.write(json.dumps({"output": "", "returncode": returncode}) + "\n")
+        out.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.server:
+        serve()
+        return
     input_path = Path(args.input).expanduser().resolve()
     output_path = Path(args.out).expanduser().resolve()
     meta = load_metadata(args.metadata)
@@ -730,6 +1059,7 @@ def main() -> None:
     include_images = not args.no_images
     include_toc = not args.no_toc
 
+    tasks = []
     for pdf in pdf_paths:
         meta_instance = dict(meta)
         meta_instance["source"] = pdf.name
@@ -741,16 +1071,49 @@ def main() -> None:
                 output_html = output_path
             else:
                 output_html = output_path / f"{pdf.stem}.html"
-        convert_pdf(
-            pdf,
-            output_html,
-            include_images,
-            meta_instance,
-            args.schema_type,
-            include_toc,
-            include_toc_pages=args.keep_toc_pages,
-        )
+        tasks.append((pdf, output_html, meta_instance))
+
+    def report(pdf: Path, output_html: Path) -> None:
         print(f"Converted: {pdf} -> {output_html}")
+        if args.report_outputs:
+            print(f"{OUTPUT_MARKER}{output_html}")
+
+    jobs = min(args.jobs, len(tasks))
+    if jobs <= 1:
+        for pdf, output_html, meta_instance in tasks:
+            convert_pdf(
+                pdf,
+                output_html,
+                include_images,
+                meta_instance,
+                args.schema_type,
+                include_toc,
+                include_toc_pages=args.keep_toc_pages,
+                workers=args.workers,
+                progress=args.progress,
+            )
+            report(pdf, output_html)
+        return
+
+    # Each PDF is independent, so whole documents go to separate processes. Page
+    # extraction stays in-process there, and per-page progress would interleave.
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(
+                convert_pdf,
+                pdf,
+                output_html,
+                include_images,
+                meta_instance,
+                args.schema_type,
+                include_toc,
+                include_toc_pages=args.keep_toc_pages,
+            ): (pdf, output_html)
+            for pdf, output_html, meta_instance in tasks
+        }
+        for future in as_completed(futures):
+            future.result()
+            report(*futures[future])
 
 
 if __name__ == "__main__":